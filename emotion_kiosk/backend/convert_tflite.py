@@ -0,0 +1,91 @@
+"""
+convert_tflite.py — Convert the Keras emotion model to a quantized TFLite model.
+
+Quantizes the model so the API can serve it with tflite-runtime instead
+of the full TensorFlow package:
+
+    --data_dir given   full-integer int8, calibrated on those faces
+                       (e.g. the FER-2013 train/ folder)  -> *_int8.tflite
+    no --data_dir      dynamic range: int8 weights, float activations;
+                       needs no calibration data           -> *_dynamic.tflite
+
+The API loads *_int8.tflite first, then *_dynamic.tflite, then the
+Keras file. The Docker image and Render build run without --data_dir.
+
+Usage:
+    python convert_tflite.py
+    python convert_tflite.py --data_dir ../data/train
+"""
+
+import os
+import sys
+import argparse
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+
+import tensorflow as tf
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "src"))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from emotion_model import tflite_filename
+from create_model import export_tflite_int8
+
+MODEL_FILENAME = "fer2013_mini_XCEPTION.102-0.66.hdf5"
+
+
+def scale_symmetric(images):
+    """[0, 255] pixels -> [-1, 1], the range mini_XCEPTION expects."""
+    return images / 127.5 - 1.0
+
+
+def convert(model_path, dest_path, data_dir=None):
+    print(f"Loading Keras model from: {model_path}")
+    model = tf.keras.models.load_model(model_path, compile=False)
+
+    if data_dir:
+        print(f"Converting (full int8, calibrated on faces from {data_dir})...")
+        export_tflite_int8(model, dest_path, data_dir, normalize=scale_symmetric)
+    else:
+        # Never calibrate on noise: this file replaces the .hdf5 in the API.
+        # Weights-only quantization needs no calibration data.
+        print("Converting (int8 weights, float activations)...")
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        with open(dest_path, "wb") as f:
+            f.write(converter.convert())
+
+    src_size = os.path.getsize(model_path) / (1024 * 1024)
+    dst_size = os.path.getsize(dest_path) / (1024 * 1024)
+    print(f"Saved: {dest_path} ({src_size:.2f} MB -> {dst_size:.2f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the emotion model to a quantized TFLite model"
+    )
+    parser.add_argument(
+        "--model", type=str, default=MODEL_FILENAME,
+        help="Keras model filename inside models/"
+    )
+    parser.add_argument(
+        "--data_dir", type=str, default=None,
+        help="Face images for full-integer int8 (dynamic-range model if omitted)"
+    )
+    args = parser.parse_args()
+
+    models_dir = os.path.join(os.path.dirname(SCRIPT_DIR), "models")
+    model_path = os.path.join(models_dir, args.model)
+    if not os.path.exists(model_path):
+        print(f"[ERROR] Model not found: {model_path}")
+        print("Run download_model.py first.")
+        sys.exit(1)
+
+    quantization = "int8" if args.data_dir else "dynamic"
+    dest_path = os.path.join(models_dir, tflite_filename(args.model, quantization))
+    convert(model_path, dest_path, args.data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 
 import os
+import hashlib
 import requests
 import sys
 
@@ -7,28 +8,49 @@ import sys
 # Source: https://github.com/oarriaga/face_classification
 MODEL_URL = "https://github.com/oarriaga/face_classification/raw/master/trained_models/emotion_models/fer2013_mini_XCEPTION.102-0.66.hdf5"
 MODEL_FILENAME = "fer2013_mini_XCEPTION.102-0.66.hdf5"
+MODEL_SHA256 = "59534287fdfb125e30a94400296c25ea9f5d706fca93dd8adbbbed916799ea0e"
 
-def download_file(url, dest_path):
+BLOCK_SIZE = 8 * 1024 * 1024 # 8MB reads -> fewer syscalls
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(BLOCK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def download_file(url, dest_path, expected_sha256=None):
     print(f"Downloading from {url}...")
+    # Write to a temp file so an interrupted download is never mistaken for the model
+    part_path = dest_path + ".part"
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024 * 1024 # 1MB chunks
-        
-        with open(dest_path, 'wb') as f:
-            downloaded = 0
-            for chunk in response.iter_content(block_size):
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    percent = (downloaded / total_size) * 100
-                    print(f"\rProgress: {percent:.1f}% ({downloaded / (1024*1024):.1f} MB)", end="")
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+
+            total_size = int(response.headers.get('content-length', 0))
+            digest = hashlib.sha256()
+
+            with open(part_path, 'wb') as f:
+                downloaded = 0
+                while chunk := response.raw.read(BLOCK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    downloaded += len(chunk)
+                    if total_size > 0:
+                        percent = (downloaded / total_size) * 100
+                        print(f"\rProgress: {percent:.1f}% ({downloaded / (1024*1024):.1f} MB)", end="")
+
+        if expected_sha256 and digest.hexdigest() != expected_sha256:
+            raise ValueError(f"checksum mismatch (got {digest.hexdigest()})")
+
+        os.replace(part_path, dest_path)
         print("\nDownload complete!")
         return True
     except Exception as e:
         print(f"\n[ERROR] Failed to download model: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return False
 
 def main():
@@ -41,12 +63,15 @@ def main():
     
     dest_path = os.path.join(models_dir, MODEL_FILENAME)
     
-    if os.path.exists(dest_path):
+    if os.path.exists(dest_path) and sha256_of(dest_path) == MODEL_SHA256:
         print(f"Model already exists at: {dest_path}")
         print("Skipping download.")
     else:
-        print(f"Model file not found. Downloading to {models_dir}...")
-        success = download_file(MODEL_URL, dest_path)
+        if os.path.exists(dest_path):
+            print("Existing model failed checksum verification. Re-downloading...")
+        else:
+            print(f"Model file not found. Downloading to {models_dir}...")
+        success = download_file(MODEL_URL, dest_path, MODEL_SHA256)
         if not success:
             sys.exit(1)
             
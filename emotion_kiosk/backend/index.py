@@ -1,8 +1,9 @@
 """
 api_server.py — FastAPI backend for the Emotion Detection Kiosk.
 
-Exposes a single endpoint that accepts a base64-encoded image frame
-and returns emotion detection results.
+Exposes endpoints that accept an image frame (base64 JSON on
+/api/detect, raw JPEG/PNG bytes on /api/detect_raw) and return emotion
+detection results.
 
 Run:
     python api_server.py
@@ -10,13 +11,21 @@ Run:
 
 import os
 import sys
+import time
 import base64
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
 
 # Add src to path (src is now a sibling in backend/src)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,10 +33,60 @@ sys.path.insert(0, os.path.join(SCRIPT_DIR, "src"))
 
 from face_detector import FaceDetector
 from emotion_model import EmotionClassifier
+from emotion_batcher import EmotionBatcher
 
 # ── Init ──────────────────────────────────────────────────────────────────────
 
-app = FastAPI(title="Emotion Detection API")
+# Frame decoding and model inference are CPU-bound; run them off the
+# event loop on a small pool
+FRAME_WORKERS = min(4, os.cpu_count() or 1)
+frame_pool = ThreadPoolExecutor(max_workers=FRAME_WORKERS, thread_name_prefix="frame")
+
+# Frames allowed in flight before /api/detect answers 429
+MAX_INFLIGHT = int(os.environ.get("MAX_INFLIGHT", FRAME_WORKERS * 2))
+
+# Duplicate-frame short-circuit: a frame whose dHash is within
+# DHASH_MAX_DISTANCE bits of the client's previous frame gets the previous
+# response, as long as that response is younger than DHASH_MAX_AGE seconds
+DHASH_MAX_DISTANCE = 2
+DHASH_MAX_AGE = 1.0
+FRAME_CACHE_SIZE = 256  # clients remembered
+
+# Per-page id the kiosk front end sends; kiosks behind one proxy or NAT
+# share a client address, so the address is only the fallback key
+KIOSK_ID_HEADER = "x-kiosk-id"
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Models are created per process here (not at import), so each
+    # uvicorn worker owns exactly one detector and one interpreter.
+    print("[INFO] Loading face detector...")
+    app.state.face_detector = FaceDetector()
+    print("[INFO] Loading emotion model...")
+    app.state.emotion_classifier = EmotionClassifier()
+    threading.Thread(
+        target=app.state.emotion_classifier.warmup, name="model-warmup", daemon=True
+    ).start()
+    app.state.emotion_batcher = EmotionBatcher(app.state.emotion_classifier, frame_pool)
+    app.state.emotion_batcher.start()
+    app.state.inflight = asyncio.Semaphore(MAX_INFLIGHT)
+    app.state.frame_cache = OrderedDict()  # client -> (dhash, response, time)
+    yield
+    await app.state.emotion_batcher.stop()
+    # Don't lose a submission still waiting on the debounced write
+    if _leaderboard_flush_task is not None:
+        _leaderboard_flush_task.cancel()
+        save_leaderboard(list(leaderboard))
+    frame_pool.shutdown(wait=False)
+
+
+print("[INFO] Server starting...")
+app = FastAPI(
+    title="Emotion Detection API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,18 +95,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-print("[INFO] Server starting...")
-face_detector = None
-emotion_classifier = None
-
-@app.on_event("startup")
-async def startup_event():
-    global face_detector, emotion_classifier
-    print("[INFO] Loading face detector...")
-    face_detector = FaceDetector()
-    print("[INFO] Loading emotion model...")
-    emotion_classifier = EmotionClassifier()
-
 
 # ── Models ────────────────────────────────────────────────────────────────────
 
@@ -63,58 +110,184 @@ class DetectResponse(BaseModel):
     bbox: list[int] | None = None
 
 
+def _detect_result(detected, face_count=0, emotion=None, confidence=0.0, bbox=None):
+    """Plain-dict DetectResponse — orjson serializes it without a Pydantic pass."""
+    return {
+        "detected": detected,
+        "emotion": emotion,
+        "confidence": confidence,
+        "face_count": face_count,
+        "bbox": bbox,
+    }
+
+
 # ── Endpoint ──────────────────────────────────────────────────────────────────
 
-@app.post("/api/detect", response_model=DetectResponse)
-async def detect_emotion(req: DetectRequest):
+# JPEG start-of-frame markers (all SOFn except DHT/JPG/DAC, which share the range)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(raw):
+    """(width, height) read from a JPEG's SOF header, or None if not a JPEG."""
+    if raw[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(raw)
+    while i + 9 < n:
+        if raw[i] != 0xFF:
+            return None
+        marker = raw[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            h = int.from_bytes(raw[i + 5:i + 7], "big")
+            w = int.from_bytes(raw[i + 7:i + 9], "big")
+            return w, h
+        i += 2 + int.from_bytes(raw[i + 2:i + 4], "big")
+    return None
+
+
+def _decode_frame(raw):
+    """Decode encoded image bytes (JPEG/PNG) into a BGR frame."""
+    # Large JPEGs are decoded straight at 1/2 or 1/4 size (libjpeg skips
+    # the high-frequency IDCT work), never going below 640px wide
+    flag = cv2.IMREAD_COLOR
+    size = _jpeg_size(raw)
+    if size is not None:
+        if size[0] >= 2560:
+            flag = cv2.IMREAD_REDUCED_COLOR_4
+        elif size[0] >= 1280:
+            flag = cv2.IMREAD_REDUCED_COLOR_2
+
+    arr = np.frombuffer(raw, dtype=np.uint8)
+    frame = cv2.imdecode(arr, flag)
+
+    if frame is not None:
+        h, w = frame.shape[:2]
+        if w > 640:
+            scale = 640 / w
+            new_h = int(h * scale)
+            frame = cv2.resize(frame, (640, new_h))
+
+    return frame
+
+
+def _decode_base64_frame(img_data):
+    """Decode a base64 (optionally data-URL) image into a BGR frame."""
+    if "," in img_data:
+        img_data = img_data.split(",", 1)[1]
+
+    return _decode_frame(base64.b64decode(img_data))
+
+
+def _frame_dhash(frame):
+    """64-bit difference hash — near-identical frames differ in only a few bits."""
+    small = cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = np.packbits(gray[:, 1:] > gray[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def _decode_and_hash(decode, data):
+    frame = decode(data)
+    if frame is None:
+        return None, None
+    return frame, _frame_dhash(frame)
+
+
+@app.post("/api/detect", response_model=None, responses={200: {"model": DetectResponse}})
+async def detect_emotion(request: Request):
     """Detect faces and classify emotion from a base64 image."""
+    # Parse the (large) base64 body with orjson rather than stdlib json
     try:
-        # Decode base64 → image
-        img_data = req.image
-        if "," in img_data:
-            img_data = img_data.split(",", 1)[1]
-
-        raw = base64.b64decode(img_data)
-        arr = np.frombuffer(raw, dtype=np.uint8)
-        frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-
-        if frame is not None:
-            h, w = frame.shape[:2]
-            if w > 640:
-                scale = 640 / w
-                new_h = int(h * scale)
-                frame = cv2.resize(frame, (640, new_h))
+        req = DetectRequest(**orjson.loads(await request.body()))
+    except (orjson.JSONDecodeError, ValidationError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return await _detect(request, _decode_base64_frame, req.image)
+
+
+@app.post("/api/detect_raw", response_model=None, responses={200: {"model": DetectResponse}})
+async def detect_emotion_raw(request: Request):
+    """Detect faces and classify emotion from a raw JPEG/PNG request body.
+
+    Same result as /api/detect without the base64 overhead: ~33% fewer
+    bytes on the wire and no base64 decode on the server.
+    """
+    return await _detect(request, _decode_frame, await request.body())
 
-        if frame is None:
-            return DetectResponse(detected=False, face_count=0)
 
-        # Detect face
-        bbox, crop, face_count = face_detector.detect(frame)
+async def _detect(request, decode, data):
+    inflight = request.app.state.inflight
+    if inflight.locked():
+        raise HTTPException(status_code=429, detail="Too many frames in flight")
 
-        if bbox is None or crop is None:
-            return DetectResponse(detected=False, face_count=face_count)
+    client = _client_key(request)
+    async with inflight:
+        result = await _run_detection(request.app.state, decode, data, client)
+    return ORJSONResponse(result)
 
-        # Classify emotion
-        emotion, confidence = emotion_classifier.predict(crop)
 
-        if emotion is None:
-            return DetectResponse(
-                detected=True,
-                face_count=face_count,
-                bbox=list(bbox),
-            )
+def _client_key(request):
+    """Dedup-cache key: the kiosk id header, else the (forwarded) client address."""
+    kiosk_id = request.headers.get(KIOSK_ID_HEADER)
+    if kiosk_id:
+        return "id:" + kiosk_id[:64]
+    return request.client.host if request.client else None
 
-        return DetectResponse(
-            detected=True,
-            emotion=emotion,
-            confidence=round(confidence, 3),
-            face_count=face_count,
-            bbox=list(bbox),
-        )
+
+async def _run_detection(state, decode, data, client):
+    loop = asyncio.get_running_loop()
+
+    try:
+        # Decode → image
+        frame, frame_hash = await loop.run_in_executor(frame_pool, _decode_and_hash, decode, data)
+
+        if frame is None:
+            return _detect_result(False)
+
+        # Kiosk cameras send long runs of near-identical frames; reuse the
+        # last answer for this client while the picture hasn't changed
+        now = time.monotonic()
+        cached = state.frame_cache.get(client)
+        if (cached is not None
+                and now - cached[2] < DHASH_MAX_AGE
+                and (cached[0] ^ frame_hash).bit_count() <= DHASH_MAX_DISTANCE):
+            return cached[1]
+
+        response = await _classify_frame(state, frame)
+
+        state.frame_cache[client] = (frame_hash, response, now)
+        state.frame_cache.move_to_end(client)
+        if len(state.frame_cache) > FRAME_CACHE_SIZE:
+            state.frame_cache.popitem(last=False)
+        return response
 
     except Exception as e:
         print(f"[ERROR] Detection failed: {e}")
-        return DetectResponse(detected=False)
+        return _detect_result(False)
+
+
+async def _classify_frame(state, frame):
+    """Run face detection and emotion classification on a decoded frame."""
+    loop = asyncio.get_running_loop()
+
+    # Detect face
+    bbox, crop, face_count = await loop.run_in_executor(
+        frame_pool, state.face_detector.detect, frame
+    )
+
+    if bbox is None or crop is None:
+        return _detect_result(False, face_count)
+
+    # Classify emotion (batched with other in-flight requests)
+    emotion, confidence = await state.emotion_batcher.predict(crop)
+
+    if emotion is None:
+        return _detect_result(True, face_count, bbox=bbox)
+
+    return _detect_result(True, face_count, emotion, confidence, bbox)
 
 
 @app.get("/api/health")
@@ -124,30 +297,61 @@ async def health():
 
 # ── Leaderboard Persistence ───────────────────────────────────────────────────
 
-import json
 from datetime import datetime
 
 LEADERBOARD_FILE = os.path.join(SCRIPT_DIR, "..", "leaderboard.json")
 
 def load_leaderboard():
+    """Entries from disk; malformed entries (or a non-list file) are dropped."""
     if not os.path.exists(LEADERBOARD_FILE):
         return []
     try:
-        with open(LEADERBOARD_FILE, "r") as f:
-            return json.load(f)
+        with open(LEADERBOARD_FILE, "rb") as f:
+            entries = orjson.loads(f.read())
     except Exception:
         return []
 
+    if not isinstance(entries, list):
+        print("[WARNING] leaderboard.json is not a list; starting empty.")
+        return []
+    valid = [e for e in entries
+             if isinstance(e, dict)
+             and isinstance(e.get("score"), (int, float))
+             and not isinstance(e.get("score"), bool)]
+    if len(valid) < len(entries):
+        print(f"[WARNING] Skipped {len(entries) - len(valid)} malformed leaderboard entries.")
+    return valid
+
 def save_leaderboard(entries):
+    """Write entries atomically (temp file + rename) so readers never see a partial file."""
+    tmp_path = LEADERBOARD_FILE + ".tmp"
     try:
-        # Keep top 50 only
-        entries.sort(key=lambda x: x["score"], reverse=True)
-        entries = entries[:50]
-        with open(LEADERBOARD_FILE, "w") as f:
-            json.dump(entries, f, indent=2)
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(entries, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, LEADERBOARD_FILE)
     except Exception as e:
         print(f"[ERROR] Failed to save leaderboard: {e}")
 
+# In-memory board (sorted, top 50); disk is only written behind it
+LEADERBOARD_SIZE = 50
+LEADERBOARD_FLUSH_DELAY = 1.0  # seconds; coalesces bursts of submissions
+
+leaderboard = load_leaderboard()
+leaderboard.sort(key=lambda x: x["score"], reverse=True)
+del leaderboard[LEADERBOARD_SIZE:]
+leaderboard_lock = asyncio.Lock()
+_leaderboard_write_lock = asyncio.Lock()
+_leaderboard_flush_task = None
+
+async def _flush_leaderboard():
+    global _leaderboard_flush_task
+    await asyncio.sleep(LEADERBOARD_FLUSH_DELAY)
+    _leaderboard_flush_task = None
+    async with leaderboard_lock:
+        snapshot = list(leaderboard)
+    async with _leaderboard_write_lock:
+        await asyncio.to_thread(save_leaderboard, snapshot)
+
 class LeaderboardEntry(BaseModel):
     name: str
     score: int
@@ -156,23 +360,46 @@ class LeaderboardEntry(BaseModel):
 
 @app.get("/api/leaderboard")
 async def get_leaderboard():
-    return load_leaderboard()
+    return leaderboard
 
 @app.post("/api/leaderboard")
 async def add_leaderboard_entry(entry: LeaderboardEntry):
-    board = load_leaderboard()
-    
+    global _leaderboard_flush_task
+
     new_entry = entry.dict()
     if not new_entry.get("date"):
         new_entry["date"] = datetime.now().isoformat()
-        
-    board.append(new_entry)
-    save_leaderboard(board)
-    return {"status": "ok", "leaderboard": board[:10]} # Return top 10 for immediate updates
+
+    async with leaderboard_lock:
+        leaderboard.append(new_entry)
+        leaderboard.sort(key=lambda x: x["score"], reverse=True)
+        del leaderboard[LEADERBOARD_SIZE:]
+        top = leaderboard[:10]
+
+    if _leaderboard_flush_task is None:
+        _leaderboard_flush_task = asyncio.create_task(_flush_leaderboard())
+
+    return {"status": "ok", "leaderboard": top} # Return top 10 for immediate updates
 
 
 # ── Run ───────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # The leaderboard and dedup cache live in process memory, so more than
+    # one worker is opt-in (uvicorn's usual WEB_CONCURRENCY variable)
+    WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+    # loop="auto" resolves to uvloop wherever it's installed (not on Windows);
+    # httptools replaces the pure-Python h11 parser. Access logging is off —
+    # it costs a formatted write per request at kiosk frame rates.
+    uvicorn.run(
+        "index:app" if WEB_CONCURRENCY > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+        access_log=False,
+    )
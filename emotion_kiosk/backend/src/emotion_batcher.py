@@ -0,0 +1,89 @@
+"""
+emotion_batcher.py — Micro-batching of concurrent emotion predictions.
+
+Requests that arrive within a few milliseconds of each other are
+coalesced into a single EmotionClassifier.predict_batch call, so
+multi-kiosk load runs the CNN at batch > 1.
+"""
+
+import asyncio
+
+from emotion_model import TFLITE_BATCH_SIZES
+
+# Never more crops than the largest pre-allocated TFLite interpreter takes
+MAX_BATCH = TFLITE_BATCH_SIZES[-1]
+MAX_WAIT = 0.005  # seconds to wait for more crops after the first one
+
+
+class EmotionBatcher:
+    """Collects face crops from concurrent requests and classifies them together."""
+
+    def __init__(self, classifier, executor=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        """
+        Args:
+            classifier: EmotionClassifier used for inference.
+            executor: Executor the (blocking) model call runs on.
+            max_batch: Largest number of crops per model call.
+            max_wait: How long to hold a batch open for more crops.
+        """
+        self.classifier = classifier
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """Start the background batching task on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def predict(self, face_crop):
+        """Queue a crop and wait for its (emotion_label, confidence)."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((face_crop, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one crop, then gather more until the batch is full or times out."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            crops = [crop for crop, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.classifier.predict_batch, crops
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
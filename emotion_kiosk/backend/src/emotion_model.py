@@ -6,15 +6,47 @@ to our display categories.
 """
 
 import os
+import threading
 import cv2
 import numpy as np
 
-# Try importing tensorflow, but don't crash if it takes time or fails
+# Prefer the lightweight TFLite runtime for inference
 try:
-    import tensorflow as tf
+    from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
+    from tflite_runtime.interpreter import load_delegate
 except ImportError:
-    print("[ERROR] tensorflow not found. pip install tensorflow")
-    tf = None
+    TFLiteInterpreter = None
+    load_delegate = None
+
+# TensorFlow takes seconds and hundreds of MB to import, and is only needed
+# without tflite-runtime or for the Keras fallback — import it on demand
+tf = None
+
+
+def _import_tensorflow():
+    """Import tensorflow on first use; returns the module or None."""
+    global tf
+    if tf is None:
+        try:
+            import tensorflow
+            tf = tensorflow
+        except ImportError:
+            print("[ERROR] tensorflow not found. pip install tflite-runtime (or tensorflow)")
+    return tf
+
+# XNNPACK delegate library; when it can't be loaded the interpreter's
+# built-in XNNPACK path is used with the same thread count
+XNNPACK_DELEGATE_LIB = "libxnnpack_delegate.so"
+
+# The TFLite model gets one interpreter per batch size here, each allocated
+# once at load; a batch is zero-padded up to the next size rather than
+# resizing (and reallocating) an interpreter whenever the size changes.
+# The largest matches EmotionBatcher's MAX_BATCH.
+TFLITE_BATCH_SIZES = (1, 2, 4, 8)
+
+# Inference gets the physical cores (SMT siblings don't help the int8
+# kernels); OpenCV in face_detector.py takes the remainder
+INFERENCE_THREADS = max(1, (os.cpu_count() or 2) // 2)
 
 # Our display emotion categories
 EMOTIONS = ["Happy", "Neutral", "Sad", "Stressed", "Surprised", "Angry"]
@@ -33,54 +65,269 @@ _FER_MAP = {
     "surprise": "Surprised",
 }
 
+# Same mapping as a (7, 6) matrix so aggregation is a single matmul
+_FER_MATRIX = np.zeros((len(_MODEL_CLASSES), len(EMOTIONS)), dtype=np.float32)
+for _i, _label in enumerate(_MODEL_CLASSES):
+    _FER_MATRIX[_i, EMOTIONS.index(_FER_MAP[_label])] = 1.0
+
+_SAD_IDX = EMOTIONS.index("Sad")
+
+
+# Model written by create_model.py / train_model.py, used when the bundled
+# mini_XCEPTION weights are missing
+FALLBACK_MODEL_FILENAME = "emotion_model.h5"
+
+# Pixel ranges the models were trained (and int8-calibrated) on:
+# mini_XCEPTION takes [-1, 1], build_emotion_model takes [0, 1]
+DEFAULT_INPUT_RANGE = (-1.0, 1.0)
+FALLBACK_INPUT_RANGE = (0.0, 1.0)
+
+
+# TFLite conversions tried before the Keras file, best first: full-integer
+# int8 (calibrated), then dynamic-range (int8 weights, float activations)
+TFLITE_QUANTIZATIONS = ("int8", "dynamic")
+
+
+def tflite_filename(model_filename, quantization="int8"):
+    """Name of the TFLite model converted from a Keras model file."""
+    return os.path.splitext(model_filename)[0] + f"_{quantization}.tflite"
+
 
 class EmotionClassifier:
-    """Classifies facial expressions using a Keras model."""
+    """Classifies facial expressions using a TFLite (or Keras) model."""
 
-    def __init__(self, model_filename="fer2013_mini_XCEPTION.102-0.66.hdf5"):
+    def __init__(self, model_filename="fer2013_mini_XCEPTION.102-0.66.hdf5",
+                 input_range=DEFAULT_INPUT_RANGE):
         self.model = None
         self.input_shape = (64, 64) # Default for mini_XCEPTION
-        
-        if tf is None:
-            print("[WARNING] TensorFlow not available. Using random fallback.")
-            return
 
-        try:
-            # Locate the model file: ../../models/model_filename
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            # emotion_model.py is in backend/src
-            # Go up 2 levels: src -> backend -> emotion_kiosk -> models
-            model_path = os.path.join(base_path, "..", "..", "models", model_filename)
-            model_path = os.path.abspath(model_path)
-
-            if not os.path.exists(model_path):
-                # Fallback to old name if new one doesn't exist
-                old_path = os.path.join(base_path, "..", "..", "models", "emotion_model.h5")
-                old_path = os.path.abspath(old_path)
-                if os.path.exists(old_path):
-                    print(f"[INFO] New model not found. Falling back to: {old_path}")
-                    model_path = old_path
-                else:
-                    print(f"[WARNING] Model file not found at: {model_path}")
-                    return
+        # Lighting correction is identical for every frame, so build the
+        # CLAHE object and gamma lookup table once instead of per predict().
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        gamma = 1.2
+        self._gamma_lut = (((np.arange(256) / 255.0) ** (1.0 / gamma)) * 255).astype("uint8")
+        self._set_input_range(*input_range)
+
+        self._infer = None
+        self._keras_fn = None
+        # TFLite interpreters are not re-entrant; serialize inference calls
+        self._lock = threading.Lock()
+
+        # Locate the model files: ../../models/
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        # emotion_model.py is in backend/src
+        # Go up 2 levels: src -> backend -> emotion_kiosk -> models
+        models_dir = os.path.abspath(os.path.join(base_path, "..", "..", "models"))
+
+        candidates = [(model_filename, input_range),
+                      (FALLBACK_MODEL_FILENAME, FALLBACK_INPUT_RANGE)]
+        for filename, value_range in candidates:
+            if filename != model_filename:
+                print(f"[INFO] {model_filename} not loaded. Falling back to: {filename}")
+            if self._load_model(models_dir, filename):
+                self._set_input_range(*value_range)
+                return
+
+        print(f"[WARNING] No emotion model found in: {models_dir}. Using random fallback.")
+
+    def _set_input_range(self, low, high):
+        """Fold gamma correction and normalization to [low, high] into one float LUT."""
+        scale = np.float32((high - low) / 255.0)
+        self._input_lut = self._gamma_lut.astype(np.float32) * scale + np.float32(low)
+
+    def _load_model(self, models_dir, model_filename):
+        """Load the model's TFLite conversion if present, else the Keras file."""
+        for quantization in TFLITE_QUANTIZATIONS:
+            tflite_path = os.path.join(models_dir, tflite_filename(model_filename, quantization))
+            if os.path.exists(tflite_path) and self._load_tflite(tflite_path):
+                return True
 
+        model_path = os.path.join(models_dir, model_filename)
+        if not os.path.exists(model_path):
+            print(f"[WARNING] Model file not found at: {model_path}")
+            return False
+        return self._load_keras(model_path)
+
+    def _load_keras(self, model_path):
+        """Load a Keras model and trace it into a single concrete function."""
+        if _import_tensorflow() is None:
+            print("[WARNING] TensorFlow not available for: " + model_path)
+            return False
+
+        try:
             print(f"[INFO] Loading emotion model from: {model_path}")
             self.model = tf.keras.models.load_model(model_path, compile=False)
+            self._infer = self._infer_keras
             print("[INFO] Model loaded successfully.")
-            
-            # Try to determine input shape from model
+        except Exception as e:
+            print(f"[ERROR] Failed to load emotion model: {e}")
+            self.model = None
+            return False
+
+        # Try to determine input shape from model
+        try:
+            # model.input_shape is usually (None, H, W, C)
+            cfg = self.model.input_shape
+            if cfg and len(cfg) == 4:
+                self.input_shape = (cfg[1], cfg[2])
+                print(f"[INFO] Auto-detected input shape: {self.input_shape}")
+        except Exception:
+            pass
+
+        # Trace a single concrete function so per-call Python/Keras
+        # dispatch is skipped; the batch dimension is left open.
+        try:
+            spec = tf.TensorSpec((None, *self.input_shape, 1), tf.float32)
+            self._keras_fn = tf.function(
+                lambda x: self.model(x, training=False), input_signature=[spec]
+            ).get_concrete_function()
+        except Exception as e:
+            print(f"[WARNING] Could not trace model, using eager calls: {e}")
+            self._keras_fn = None
+        return True
+
+    def _load_tflite(self, model_path):
+        """Load a TFLite model and cache its tensor indices and quant params."""
+        if TFLiteInterpreter is not None:
+            interpreter_cls, delegate_loader = TFLiteInterpreter, load_delegate
+        elif _import_tensorflow() is not None:
+            interpreter_cls, delegate_loader = tf.lite.Interpreter, tf.lite.experimental.load_delegate
+        else:
+            print("[WARNING] No TFLite runtime available for: " + model_path)
+            return False
+
+        def create_interpreter(batch):
+            # Delegates can't be shared between interpreters; each gets its own
+            delegates = []
             try:
-                # model.input_shape is usually (None, H, W, C)
-                cfg = self.model.input_shape
-                if cfg and len(cfg) == 4:
-                    self.input_shape = (cfg[1], cfg[2])
-                    print(f"[INFO] Auto-detected input shape: {self.input_shape}")
+                delegates.append(delegate_loader(
+                    XNNPACK_DELEGATE_LIB, {"num_threads": INFERENCE_THREADS}))
             except Exception:
                 pass
+            interpreter = interpreter_cls(
+                model_path=model_path,
+                num_threads=INFERENCE_THREADS,
+                experimental_delegates=delegates or None,
+            )
+            if batch != 1:
+                inp = interpreter.get_input_details()[0]
+                interpreter.resize_tensor_input(inp["index"], [batch, *inp["shape"][1:]])
+            interpreter.allocate_tensors()
+            return interpreter, bool(delegates)
+
+        try:
+            print(f"[INFO] Loading TFLite emotion model from: {model_path}")
+            interpreters = {}
+            for batch in TFLITE_BATCH_SIZES:
+                interpreters[batch], xnnpack = create_interpreter(batch)
+            interpreter = interpreters[1]
 
+            inp = interpreter.get_input_details()[0]
+            out = interpreter.get_output_details()[0]
+            self._input_index = inp["index"]
+            self._input_dtype = inp["dtype"]
+            self._input_quant = inp["quantization"]  # (scale, zero_point)
+            self._output_index = out["index"]
+            self._output_quant = out["quantization"]
 
+            # input shape is (1, H, W, C)
+            self.input_shape = (int(inp["shape"][1]), int(inp["shape"][2]))
+            self.model = interpreter
+            self._interpreters = interpreters
+            self._infer = self._infer_tflite
+            # Integer input means full-integer kernels; float input means the
+            # activations stay float (dynamic-range or unquantized model)
+            if np.issubdtype(self._input_dtype, np.integer):
+                mode = "full int8"
+            else:
+                mode = "float activations"
+            print(f"[INFO] TFLite model loaded ({mode}). Input shape: {self.input_shape}, "
+                  f"threads: {INFERENCE_THREADS}, XNNPACK delegate: {xnnpack}, "
+                  f"batch sizes: {TFLITE_BATCH_SIZES}")
+            return True
         except Exception as e:
-            print(f"[ERROR] Failed to load emotion model: {e}")
+            print(f"[ERROR] Failed to load TFLite model: {e}")
+            return False
+
+    def _infer_keras(self, input_arr):
+        if self._keras_fn is not None:
+            return self._keras_fn(tf.constant(input_arr)).numpy()
+        # fast inference: use __call__ instead of .predict()
+        return self.model(input_arr, training=False).numpy()
+
+    def _infer_tflite(self, input_arr):
+        scale, zero_point = self._input_quant
+        if scale:
+            # Quantize float input to the model's integer input type
+            info = np.iinfo(self._input_dtype)
+            input_arr = np.round(input_arr / scale + zero_point)
+            input_arr = np.clip(input_arr, info.min, info.max)
+        input_arr = input_arr.astype(self._input_dtype, copy=False)
+
+        # Run in chunks of the largest size, each padded up to the next
+        # pre-allocated interpreter size; padding rows are sliced off
+        largest = TFLITE_BATCH_SIZES[-1]
+        outputs = []
+        for start in range(0, len(input_arr), largest):
+            chunk = input_arr[start:start + largest]
+            n = len(chunk)
+            size = next(b for b in TFLITE_BATCH_SIZES if b >= n)
+            if size > n:
+                padding = np.zeros((size - n, *chunk.shape[1:]), dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding])
+
+            interpreter = self._interpreters[size]
+            interpreter.set_tensor(self._input_index, chunk)
+            interpreter.invoke()
+            outputs.append(interpreter.get_tensor(self._output_index)[:n])
+
+        preds = outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+        scale, zero_point = self._output_quant
+        if scale:
+            preds = (preds.astype("float32") - zero_point) * scale
+        return preds
+
+    def _preprocess(self, face_crop):
+        """Turn a BGR (or gray) face crop into a normalized (H, W, 1) array."""
+        # 1. Grayscale
+        gray = face_crop
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+
+        # --- LIGHTING CORRECTION ---
+        # CLAHE (Contrast Limited Adaptive Histogram Equalization) runs at crop
+        # resolution: its 8x8 tiles and clip limit are tuned for that, and
+        # on the small model input it behaves differently
+        gray = self._clahe.apply(gray)
+        # Gamma correction (brightens dark images) and normalization to the
+        # model's input range in a single float32 lookup
+        x = cv2.LUT(gray, self._input_lut)
+        # ---------------------------
+
+        # 2. Resize to the model input
+        target_h, target_w = self.input_shape
+        x = cv2.resize(x, (target_w, target_h))
+        return x.reshape(target_h, target_w, 1)
+
+    def warmup(self):
+        """Run one dummy prediction so the first real request doesn't pay cold-start cost."""
+        self.predict(np.zeros((*self.input_shape, 3), dtype=np.uint8))
+
+    def _label_scores(self, scores):
+        """Pick the display label from aggregated category scores."""
+        best_idx = int(scores.argmax())
+        best_cat = EMOTIONS[best_idx]
+        confidence = float(scores[best_idx])
+
+        # Aggressively suppress "Surprised" as it's often a false positive in this model
+        if best_cat == "Surprised" and confidence < 0.82:
+            best_cat = "Neutral"
+        
+        # Additional check: if Stressed and Sad are close, prefer Sad for better UX
+        if best_cat == "Stressed" and scores[_SAD_IDX] > 0.25:
+            best_cat = "Sad"
+
+        return best_cat, confidence
 
     def predict(self, face_crop):
         """
@@ -92,79 +339,50 @@ class EmotionClassifier:
         Returns:
             Tuple of (emotion_label, confidence).
         """
-        if face_crop is None or face_crop.size == 0:
-            return None, 0.0
+        return self.predict_batch([face_crop])[0]
+
+    def predict_batch(self, face_crops):
+        """
+        Predict emotions for several face crops with one model call.
+
+        Args:
+            face_crops: List of BGR face images (numpy arrays).
+
+        Returns:
+            List of (emotion_label, confidence) tuples, one per crop.
+        """
+        results = [(None, 0.0)] * len(face_crops)
+        valid = [i for i, crop in enumerate(face_crops)
+                 if crop is not None and crop.size > 0]
+        if not valid:
+            return results
 
         # Fallback if model is not loaded
         if self.model is None:
-            idx = np.random.randint(0, len(EMOTIONS))
-            return EMOTIONS[idx], np.random.uniform(0.4, 0.85)
+            for i in valid:
+                idx = np.random.randint(0, len(EMOTIONS))
+                results[i] = (EMOTIONS[idx], np.random.uniform(0.4, 0.85))
+            return results
 
         try:
-            # Preprocess
-            # 1. Grayscale
-            if len(face_crop.shape) == 3:
-                gray_face = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
-            else:
-                gray_face = face_crop
-
-            # --- LIGHTING CORRECTION ---
-            # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            gray_face = clahe.apply(gray_face)
-
-            # Apply Gamma Correction (brighten dark images)
-            gamma = 1.2
-            invGamma = 1.0 / gamma
-            table = np.array([((i / 255.0) ** invGamma) * 255
-                              for i in np.arange(0, 256)]).astype("uint8")
-            gray_face = cv2.LUT(gray_face, table)
-            # ---------------------------
-
-            # 2. Resize to model input shape
-            target_h, target_w = self.input_shape
-            resized = cv2.resize(gray_face, (target_w, target_h))
-
-            # 3. Normalize to [-1, 1] for mini_XCEPTION
-            # (pixel / 255.0) - 0.5) * 2.0
-            input_arr = resized.astype("float32") / 255.0
-            input_arr = input_arr - 0.5
-            input_arr = input_arr * 2.0
-            
-            # 4. Expand dims -> (1, H, W, 1)
-            input_arr = np.expand_dims(input_arr, axis=0)
-            input_arr = np.expand_dims(input_arr, axis=-1)
+            input_arr = np.stack([self._preprocess(face_crops[i]) for i in valid]) # (B, H, W, 1)
 
             # Predict
-            # fast inference: use __call__ instead of .predict()
-            preds = self.model(input_arr, training=False).numpy()[0] # [p0, p1, ..., p6]
+            with self._lock:
+                preds = self._infer(input_arr) # (B, 7)
 
             # Aggregate scores for our display categories
-            scores = {cat: 0.0 for cat in EMOTIONS}
-            
-            for i, prob in enumerate(preds):
-                if i < len(_MODEL_CLASSES):
-                    raw_label = _MODEL_CLASSES[i]
-                    display_cat = _FER_MAP.get(raw_label)
-                    if display_cat:
-                        scores[display_cat] += prob
-            
-            # Find Best
-            best_cat = max(scores, key=scores.get)
-            confidence = scores[best_cat]
-
-            # Aggressively suppress "Surprised" as it's often a false positive in this model
-            if best_cat == "Surprised" and confidence < 0.82:
-                best_cat = "Neutral"
-            
-            # Additional check: if Stressed and Sad are close, prefer Sad for better UX
-            if best_cat == "Stressed" and scores.get("Sad", 0) > 0.25:
-                best_cat = "Sad"
-
-            return best_cat, confidence
+            n = min(preds.shape[1], len(_MODEL_CLASSES))
+            scores = preds[:, :n] @ _FER_MATRIX[:n]
+
+            for i, row in zip(valid, scores):
+                results[i] = self._label_scores(row)
+            return results
 
         except Exception as e:
             print(f"[ERROR] Prediction failed: {e}")
             # Fallback
-            idx = np.random.randint(0, len(EMOTIONS))
-            return EMOTIONS[idx], 0.5
+            for i in valid:
+                idx = np.random.randint(0, len(EMOTIONS))
+                results[i] = (EMOTIONS[idx], 0.5)
+            return results
@@ -1,4 +1,3 @@
-
 import requests
 import base64
 import numpy as np
@@ -11,10 +10,10 @@ def test_api():
     img = np.zeros((480, 640, 3), dtype=np.uint8)
     _, buffer = cv2.imencode('.jpg', img)
     img_str = base64.b64encode(buffer).decode('utf-8')
-    
+
     url = "http://127.0.0.1:8000/api/detect"
     payload = {"image": img_str}
-    
+
     try:
         response = requests.post(url, json=payload)
         print(f"Status Code: {response.status_code}")
@@ -22,5 +21,15 @@ def test_api():
     except Exception as e:
         print(f"Request failed: {e}")
 
+    # Same frame as raw JPEG bytes — the endpoint the kiosk front end calls
+    url_raw = "http://127.0.0.1:8000/api/detect_raw"
+
+    try:
+        response = requests.post(url_raw, data=buffer.tobytes(), headers={"Content-Type": "image/jpeg"})
+        print(f"Raw Status Code: {response.status_code}")
+        print(f"Raw Response: {response.text}")
+    except Exception as e:
+        print(f"Raw request failed: {e}")
+
 if __name__ == "__main__":
     test_api()
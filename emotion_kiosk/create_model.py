@@ -9,15 +9,25 @@ from FER-2013 or similar datasets.
 
 Usage:
     python create_model.py
+    python create_model.py --fuse    # also save a Conv+BN-fused inference copy
+    python create_model.py --data_dir data/train   # calibrate int8 on real faces
+
+Besides the .h5, the script writes:
+    models/emotion_model_savedmodel/   fixed 1x48x48x1 serving signature
+    models/emotion_model_int8.tflite   int8-quantized, for CPU inference
+    models/emotion_model_fp16.tflite   for GPU delegates (and as the
+                                       fallback when int8 conversion fails)
 """
 
 import os
+import argparse
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
+import numpy as np
 import tensorflow as tf
 from tensorflow import keras
-from tensorflow.keras import layers
+from tensorflow.keras import layers, mixed_precision
 
 
 def build_emotion_model(num_classes=7, input_shape=(48, 48, 1)):
@@ -25,10 +35,18 @@ def build_emotion_model(num_classes=7, input_shape=(48, 48, 1)):
     Build a lightweight CNN for facial emotion classification.
 
     Architecture:
-        - 4 Convolutional blocks with Batch Normalization and MaxPooling
+        - 4 Convolutional blocks with Batch Normalization and MaxPooling.
+          Block 1 uses "valid" padding so no work is spent on the 48x48
+          border; later blocks keep "same" so pooling halves cleanly.
+          Convs carry no bias (the following BN has one, and fuse_conv_bn
+          folds it back in) and use ReLU6, whose bounded range quantizes
+          well to int8.
+          Only the first conv is a full Conv2D; the rest are depthwise-
+          separable (MobileNet-style), which cuts the multiply count of
+          the 128/256-channel blocks by ~8x.
         - Global Average Pooling
-        - Dense layers with Dropout
-        - Softmax output
+        - Dense(64) + ReLU6 + Dropout, then the softmax Dense (no BN in
+          the head, which keeps it free of float islands under int8)
 
     Args:
         num_classes: Number of emotion categories.
@@ -41,54 +59,50 @@ def build_emotion_model(num_classes=7, input_shape=(48, 48, 1)):
         # Input
         layers.Input(shape=input_shape),
 
-        # Block 1
-        layers.Conv2D(32, (3, 3), padding="same"),
+        # Block 1 (unpadded: 48 -> 46 -> 44, pooled to 22)
+        layers.Conv2D(32, (3, 3), padding="valid", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
-        layers.Conv2D(32, (3, 3), padding="same"),
+        layers.ReLU(6.0),
+        layers.SeparableConv2D(32, (3, 3), padding="valid", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
+        layers.ReLU(6.0),
         layers.MaxPooling2D(pool_size=(2, 2)),
         layers.Dropout(0.25),
 
         # Block 2
-        layers.Conv2D(64, (3, 3), padding="same"),
+        layers.SeparableConv2D(64, (3, 3), padding="same", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
-        layers.Conv2D(64, (3, 3), padding="same"),
+        layers.ReLU(6.0),
+        layers.SeparableConv2D(64, (3, 3), padding="same", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
+        layers.ReLU(6.0),
         layers.MaxPooling2D(pool_size=(2, 2)),
         layers.Dropout(0.25),
 
         # Block 3
-        layers.Conv2D(128, (3, 3), padding="same"),
+        layers.SeparableConv2D(128, (3, 3), padding="same", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
-        layers.Conv2D(128, (3, 3), padding="same"),
+        layers.ReLU(6.0),
+        layers.SeparableConv2D(128, (3, 3), padding="same", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
+        layers.ReLU(6.0),
         layers.MaxPooling2D(pool_size=(2, 2)),
         layers.Dropout(0.25),
 
         # Block 4
-        layers.Conv2D(256, (3, 3), padding="same"),
+        layers.SeparableConv2D(256, (3, 3), padding="same", use_bias=False),
         layers.BatchNormalization(),
-        layers.Activation("relu"),
+        layers.ReLU(6.0),
         layers.MaxPooling2D(pool_size=(2, 2)),
         layers.Dropout(0.25),
 
         # Classification head
         layers.GlobalAveragePooling2D(),
-        layers.Dense(256),
-        layers.BatchNormalization(),
-        layers.Activation("relu"),
+        layers.Dense(64),
+        layers.ReLU(6.0),
         layers.Dropout(0.5),
-        layers.Dense(128),
-        layers.BatchNormalization(),
-        layers.Activation("relu"),
-        layers.Dropout(0.3),
-        layers.Dense(num_classes, activation="softmax"),
+        # float32 output keeps softmax stable under a mixed_float16 policy
+        layers.Dense(num_classes, activation="softmax", dtype="float32"),
     ])
 
     model.compile(
@@ -100,7 +114,162 @@ def build_emotion_model(num_classes=7, input_shape=(48, 48, 1)):
     return model
 
 
+def enable_mixed_precision():
+    """
+    Switch Keras to the mixed_float16 policy when a GPU is available.
+
+    Convs and Dense layers then compute in float16 (float32 variables), which
+    roughly halves activation bandwidth on tensor-core GPUs. On CPU float16
+    is slower, so the policy is left at float32 there.
+
+    Returns:
+        True if mixed precision was enabled.
+    """
+    if not tf.config.list_physical_devices("GPU"):
+        return False
+    mixed_precision.set_global_policy("mixed_float16")
+    return True
+
+
+def fuse_conv_bn(model):
+    """
+    Fold every BatchNormalization into the Conv2D/SeparableConv2D before it.
+
+    At inference BN is an affine map per output channel, so it can be baked
+    into the conv weights:  W' = W * g,  b' = (b - mean) * g + beta  with
+    g = gamma / sqrt(var + eps). For SeparableConv2D the scale goes on the
+    pointwise kernel. Outputs are unchanged; the BN layers disappear.
+
+    Args:
+        model: Sequential model (typically trained).
+
+    Returns:
+        New Sequential inference model without the folded BN layers.
+    """
+    new_layers = []
+    new_weights = []
+    src = model.layers
+    i = 0
+    while i < len(src):
+        layer = src[i]
+        nxt = src[i + 1] if i + 1 < len(src) else None
+
+        if (isinstance(layer, (layers.Conv2D, layers.SeparableConv2D))
+                and isinstance(nxt, layers.BatchNormalization)):
+            gamma, beta, mean, var = nxt.get_weights()
+            scale = gamma / np.sqrt(var + nxt.epsilon)
+
+            weights = layer.get_weights()
+            bias = weights.pop() if layer.use_bias else np.zeros_like(mean)
+            # Conv2D: [kernel]; SeparableConv2D: [depthwise, pointwise]
+            weights[-1] = weights[-1] * scale
+            weights.append((bias - mean) * scale + beta)
+
+            config = layer.get_config()
+            config["use_bias"] = True
+            new_layers.append(layer.__class__.from_config(config))
+            new_weights.append(weights)
+            i += 2
+        else:
+            new_layers.append(layer.__class__.from_config(layer.get_config()))
+            new_weights.append(layer.get_weights())
+            i += 1
+
+    fused = keras.Sequential([layers.Input(shape=model.input_shape[1:])] + new_layers)
+    for layer, weights in zip(new_layers, new_weights):
+        layer.set_weights(weights)
+    return fused
+
+
+# Faces drawn from the calibration set for int8 quantization
+CALIBRATION_SAMPLES = 200
+
+
+def scale_unit(images):
+    """[0, 255] pixels -> [0, 1], the range build_emotion_model is trained on."""
+    return images / 255.0
+
+
+def representative_dataset(input_shape, data_dir=None, normalize=scale_unit,
+                           num_samples=CALIBRATION_SAMPLES):
+    """
+    Calibration samples for int8 quantization.
+
+    Uses grayscale images from data_dir when given (e.g. a FER-2013 train/
+    slice, searched recursively), otherwise random pixels. Samples are
+    passed through `normalize`, which must match the model's input range.
+    """
+    h, w, _ = input_shape
+
+    def gen():
+        if data_dir:
+            ds = keras.utils.image_dataset_from_directory(
+                data_dir, labels=None, color_mode="grayscale",
+                image_size=(h, w), batch_size=1, shuffle=True,
+            )
+            for image in ds.take(num_samples):
+                yield [normalize(tf.cast(image, tf.float32))]
+        else:
+            for _ in range(num_samples):
+                pixels = np.random.uniform(0.0, 255.0, (1, *input_shape)).astype("float32")
+                yield [normalize(pixels)]
+
+    return gen
+
+
+def export_tflite_int8(model, dest_path, data_dir=None, normalize=scale_unit,
+                       num_samples=CALIBRATION_SAMPLES):
+    """Full-integer post-training quantization to a .tflite file."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(
+        model.input_shape[1:], data_dir, normalize, num_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+
+    with open(dest_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_tflite_fp16(model, dest_path):
+    """Float16-weight TFLite export; needs no calibration data."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+
+    with open(dest_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def make_infer_fn(model, batch_size=1, jit_compile=False):
+    """
+    Trace the model once for a fixed [batch_size, H, W, C] float32 input.
+
+    The returned concrete function skips Keras' per-call dispatch and
+    retracing; with jit_compile=True the fixed-shape graph goes through XLA.
+    """
+    spec = tf.TensorSpec([batch_size, *model.input_shape[1:]], tf.float32, name="image")
+
+    @tf.function(input_signature=[spec], jit_compile=jit_compile)
+    def infer(image):
+        return {"probabilities": model(image, training=False)}
+
+    return infer.get_concrete_function()
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Create the emotion CNN model")
+    parser.add_argument(
+        "--fuse", action="store_true",
+        help="Also save emotion_model_infer.h5 with BatchNorm folded into the convs"
+    )
+    parser.add_argument(
+        "--data_dir", type=str, default=None,
+        help="Face images used to calibrate int8 quantization (random inputs if omitted)"
+    )
+    args = parser.parse_args()
+
     models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
     os.makedirs(models_dir, exist_ok=True)
     model_path = os.path.join(models_dir, "emotion_model.h5")
@@ -119,6 +288,43 @@ def main():
     file_size = os.path.getsize(model_path) / (1024 * 1024)
     print(f"Model saved! ({file_size:.1f} MB)")
     print()
+
+    saved_model_dir = os.path.join(models_dir, "emotion_model_savedmodel")
+    tf.saved_model.save(model, saved_model_dir,
+                        signatures={"serving_default": make_infer_fn(model)})
+    print(f"SavedModel (1x48x48x1 serving signature) saved to: {saved_model_dir}")
+    print()
+
+    tflite_exports = [
+        ("int8", "emotion_model_int8.tflite",
+         lambda path: export_tflite_int8(model, path, args.data_dir)),
+        ("fp16", "emotion_model_fp16.tflite",
+         lambda path: export_tflite_fp16(model, path)),
+    ]
+    for name, filename, export in tflite_exports:
+        tflite_path = os.path.join(models_dir, filename)
+        print(f"Exporting {name} TFLite model...")
+        try:
+            export(tflite_path)
+        except Exception as e:
+            print(f"[ERROR] {name} TFLite export failed: {e}")
+            continue
+        file_size = os.path.getsize(tflite_path) / (1024 * 1024)
+        print(f"TFLite model saved to: {tflite_path} ({file_size:.2f} MB)")
+    print()
+
+    if args.fuse:
+        infer_path = os.path.join(models_dir, "emotion_model_infer.h5")
+        fused = fuse_conv_bn(model)
+
+        sample = np.random.rand(4, *model.input_shape[1:]).astype("float32")
+        max_diff = np.abs(model(sample, training=False) - fused(sample, training=False)).max()
+        print(f"Fused Conv+BN: {len(model.layers)} -> {len(fused.layers)} layers "
+              f"(max output diff {max_diff:.2e})")
+
+        fused.save(infer_path)
+        print(f"Inference model saved to: {infer_path}")
+        print()
     print("NOTE: This model has RANDOM weights.")
     print("      For real predictions, train it using train_model.py")
     print("      or replace emotion_model.h5 with a pre-trained model.")
@@ -9,48 +9,110 @@ Run this script once to populate the audio/ directory:
 """
 
 import os
-import struct
-import wave
 import math
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# NumPy is optional: without it a pure-Python fallback renders the tones
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio")
 
 
-def generate_sine_wav(filepath, duration_s, frequency_hz, sample_rate=44100,
-                      amplitude=0.5, fade_in=0.1, fade_out=0.3,
-                      second_freq=None, modulation_rate=0.0):
+def _time_vector(duration_s, sample_rate):
+    """Sample times in seconds for a tone of the given duration."""
+    return np.arange(int(duration_s * sample_rate), dtype=np.float64) / sample_rate
+
+
+def _render_numpy(duration_s, frequency_hz, sample_rate, amplitude,
+                  fade_in, fade_out, second_freq, modulation_rate):
+    """Render the tone as an int16 NumPy array."""
+    t = _time_vector(duration_s, sample_rate)
+    # Every intermediate goes into `value` or one reused scratch buffer
+    scratch = np.empty_like(t)
+
+    # Base tone
+    value = np.multiply(t, 2 * np.pi * frequency_hz)
+    np.sin(value, out=value)
+
+    # Add second harmonic if specified
+    if second_freq is not None:
+        np.multiply(t, 2 * np.pi * second_freq, out=scratch)
+        np.sin(scratch, out=scratch)
+        scratch *= 0.4
+        value += scratch
+        value /= 1.4  # Normalize
+
+    # Amplitude modulation (tremolo effect)
+    if modulation_rate > 0:
+        np.multiply(t, 2 * np.pi * modulation_rate, out=scratch)
+        np.sin(scratch, out=scratch)
+        scratch *= 0.3
+        scratch += 0.7
+        value *= scratch
+
+    # Apply amplitude
+    value *= amplitude
+
+    # Fade in / fade out (linear ramps, 1.0 in between)
+    if fade_in > 0:
+        np.divide(t, fade_in, out=scratch)
+        np.minimum(scratch, 1.0, out=scratch)
+        value *= scratch
+    if fade_out > 0:
+        np.subtract(duration_s, t, out=scratch)
+        scratch /= fade_out
+        np.minimum(scratch, 1.0, out=scratch)
+        value *= scratch
+
+    # Clamp and convert to 16-bit integers (native byte order, as wave expects)
+    np.clip(value, -1.0, 1.0, out=value)
+    value *= 32767
+    return value.astype(np.int16)
+
+
+def _render_python(duration_s, frequency_hz, sample_rate, amplitude,
+                   fade_in, fade_out, second_freq, modulation_rate):
     """
-    Generate a WAV file with a sine wave tone.
+    Render the tone as an array('h') without NumPy.
 
-    Args:
-        filepath: Output .wav file path.
-        duration_s: Duration in seconds.
-        frequency_hz: Base frequency in Hz.
-        sample_rate: Sample rate (default 44100).
-        amplitude: Volume (0.0 to 1.0).
-        fade_in: Fade-in duration in seconds.
-        fade_out: Fade-out duration in seconds.
-        second_freq: Optional second frequency for a layered tone.
-        modulation_rate: Amplitude modulation rate in Hz (0 = none).
+    Each sine is produced by the recurrence s[n+1] = 2cos(w)*s[n] - s[n-1]
+    (w = 2*pi*f/sample_rate), so the loop does a few multiplies per sample
+    instead of calling math.sin.
     """
+    def oscillator(freq):
+        w = 2 * math.pi * freq / sample_rate
+        # (coefficient, s[0] = sin(0), s[-1] = sin(-w))
+        return 2 * math.cos(w), 0.0, -math.sin(w)
+
     n_samples = int(duration_s * sample_rate)
-    samples = []
+    c1, s1, p1 = oscillator(frequency_hz)
+    if second_freq is not None:
+        c2, s2, p2 = oscillator(second_freq)
+    if modulation_rate > 0:
+        cm, sm, pm = oscillator(modulation_rate)
 
+    samples = array("h", bytes(2 * n_samples))
     for i in range(n_samples):
         t = i / sample_rate
 
         # Base tone
-        value = math.sin(2 * math.pi * frequency_hz * t)
+        value = s1
+        s1, p1 = c1 * s1 - p1, s1
 
         # Add second harmonic if specified
         if second_freq is not None:
-            value += 0.4 * math.sin(2 * math.pi * second_freq * t)
-            value /= 1.4  # Normalize
+            value = (value + 0.4 * s2) / 1.4  # Normalize
+            s2, p2 = c2 * s2 - p2, s2
 
         # Amplitude modulation (tremolo effect)
         if modulation_rate > 0:
-            mod = 0.7 + 0.3 * math.sin(2 * math.pi * modulation_rate * t)
-            value *= mod
+            value *= 0.7 + 0.3 * sm
+            sm, pm = cm * sm - pm, sm
 
         # Apply amplitude
         value *= amplitude
@@ -64,32 +126,52 @@ def generate_sine_wav(filepath, duration_s, frequency_hz, sample_rate=44100,
         if time_from_end < fade_out:
             value *= time_from_end / fade_out
 
-        # Clamp
-        value = max(-1.0, min(1.0, value))
+        # Clamp and convert to 16-bit integer
+        samples[i] = int(max(-1.0, min(1.0, value)) * 32767)
+
+    return samples
 
-        # Convert to 16-bit integer
-        sample = int(value * 32767)
-        samples.append(sample)
 
-    # Write WAV file
+def generate_sine_wav(filepath, duration_s, frequency_hz, sample_rate=44100,
+                      amplitude=0.5, fade_in=0.1, fade_out=0.3,
+                      second_freq=None, modulation_rate=0.0):
+    """
+    Generate a WAV file with a sine wave tone.
+
+    Args:
+        filepath: Output .wav file path.
+        duration_s: Duration in seconds.
+        frequency_hz: Base frequency in Hz.
+        sample_rate: Sample rate (default 44100).
+        amplitude: Volume (0.0 to 1.0).
+        fade_in: Fade-in duration in seconds.
+        fade_out: Fade-out duration in seconds.
+        second_freq: Optional second frequency for a layered tone.
+        modulation_rate: Amplitude modulation rate in Hz (0 = none).
+    """
+    render = _render_numpy if np is not None else _render_python
+    samples = render(duration_s, frequency_hz, sample_rate, amplitude,
+                     fade_in, fade_out, second_freq, modulation_rate)
+
+    # Write WAV file in a single call. Declaring the frame count up front
+    # lets wave write the final header once (no seek-back patch), and the
+    # int16 buffer is passed as-is rather than copied through tobytes().
     with wave.open(filepath, "w") as wav_file:
         wav_file.setnchannels(1)       # Mono
         wav_file.setsampwidth(2)       # 16-bit
         wav_file.setframerate(sample_rate)
-        for sample in samples:
-            wav_file.writeframes(struct.pack("<h", sample))
+        wav_file.setnframes(len(samples))
+        wav_file.writeframes(samples)
 
     file_size = os.path.getsize(filepath) / 1024
     print(f"  Created: {filepath} ({file_size:.0f} KB, {duration_s}s)")
 
 
-def main():
-    os.makedirs(AUDIO_DIR, exist_ok=True)
-    print("Generating audio files...\n")
-
+# One entry per emotion; each file is independent, so they render in parallel
+AUDIO_SPECS = [
     # Happy: Bright, upbeat, major chord feel
-    generate_sine_wav(
-        os.path.join(AUDIO_DIR, "happy.wav"),
+    dict(
+        filename="happy.wav",
         duration_s=12.0,
         frequency_hz=523.25,     # C5
         amplitude=0.4,
@@ -97,11 +179,11 @@ def main():
         fade_out=1.5,
         second_freq=659.25,      # E5 (major third)
         modulation_rate=3.0,     # Gentle pulsing
-    )
+    ),
 
     # Sad: Slow, warm, low-frequency comfort tone
-    generate_sine_wav(
-        os.path.join(AUDIO_DIR, "sad.wav"),
+    dict(
+        filename="sad.wav",
         duration_s=12.0,
         frequency_hz=261.63,     # C4 (middle C)
         amplitude=0.35,
@@ -109,11 +191,11 @@ def main():
         fade_out=2.0,
         second_freq=311.13,      # Eb4 (minor third)
         modulation_rate=0.5,     # Very slow pulse
-    )
+    ),
 
     # Stressed: Calm, soothing, low drone
-    generate_sine_wav(
-        os.path.join(AUDIO_DIR, "stressed.wav"),
+    dict(
+        filename="stressed.wav",
         duration_s=12.0,
         frequency_hz=196.0,      # G3
         amplitude=0.3,
@@ -121,17 +203,34 @@ def main():
         fade_out=2.5,
         second_freq=293.66,      # D4 (perfect fifth)
         modulation_rate=0.3,     # Very slow breathing rhythm
-    )
+    ),
 
     # Neutral: Very quiet ambient hum (practically silent)
-    generate_sine_wav(
-        os.path.join(AUDIO_DIR, "neutral.wav"),
+    dict(
+        filename="neutral.wav",
         duration_s=5.0,
         frequency_hz=220.0,      # A3
         amplitude=0.05,          # Very quiet
         fade_in=1.0,
         fade_out=2.0,
-    )
+    ),
+]
+
+
+def _generate_from_spec(spec):
+    """Process-pool worker: render one AUDIO_SPECS entry."""
+    spec = dict(spec)
+    filepath = os.path.join(AUDIO_DIR, spec.pop("filename"))
+    generate_sine_wav(filepath, **spec)
+
+
+def main():
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    print("Generating audio files...\n")
+
+    workers = min(len(AUDIO_SPECS), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_generate_from_spec, AUDIO_SPECS))
 
     print(f"\nAll audio files generated in: {AUDIO_DIR}")
 
@@ -8,13 +8,31 @@ export interface DetectResult {
   bbox: number[] | null;
 }
 
+// Identifies this kiosk to the backend's duplicate-frame cache. Behind a
+// proxy or NAT every kiosk shares one client address, so without it they
+// would get each other's cached results.
+let kioskId: string | null = null;
+
+function getKioskId(): string {
+  if (!kioskId) {
+    kioskId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+  }
+  return kioskId;
+}
+
 export async function detectEmotion(
   base64Image: string
 ): Promise<DetectResult> {
-  const res = await fetch(`${API_URL}/api/detect`, {
+  // Send the JPEG bytes rather than base64 JSON: ~33% smaller upload and
+  // no base64 decode on the server
+  const blob = await (await fetch(base64Image)).blob();
+  const res = await fetch(`${API_URL}/api/detect_raw`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ image: base64Image }),
+    headers: {
+      "Content-Type": blob.type || "image/jpeg",
+      "X-Kiosk-Id": getKioskId(),
+    },
+    body: blob,
   });
 
   if (!res.ok) {
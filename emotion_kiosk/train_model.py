@@ -21,6 +21,9 @@ Expected structure:
 Usage:
     python train_model.py --data_dir data/ --epochs 50
 
+After training, the best model is also exported as an int8-quantized
+models/emotion_model_int8.tflite, calibrated on the training images.
+
 For FER-2013, you may need to map original labels:
     angry    → stressed
     disgust  → stressed
@@ -38,31 +41,39 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
 
 import tensorflow as tf
 from tensorflow import keras
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras import layers
 
-from create_model import build_emotion_model
+from create_model import build_emotion_model, enable_mixed_precision, export_tflite_int8
 
 
-# Emotion labels must match model output order (sorted alphabetically by default in flow_from_directory)
+# Emotion labels must match model output order (passed as class_names, so the
+# directory listing order doesn't matter)
 EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
 
+SHUFFLE_BUFFER = 10_000
 
-def create_data_generators(data_dir, batch_size=64, img_size=48):
-    """Create training and validation data generators."""
 
-    train_datagen = ImageDataGenerator(
-        rescale=1.0 / 255,
-        rotation_range=15,
-        width_shift_range=0.15,
-        height_shift_range=0.15,
-        horizontal_flip=True,
-        zoom_range=0.1,
-        shear_range=0.1,
-        brightness_range=[0.8, 1.2],
-    )
+def random_brightness_scale(images, low=0.8, high=1.2):
+    """Scale each image's brightness by a factor in [low, high], like brightness_range."""
+    factors = tf.random.uniform([tf.shape(images)[0], 1, 1, 1], low, high)
+    return tf.clip_by_value(images * factors, 0.0, 1.0)
+
 
-    val_datagen = ImageDataGenerator(rescale=1.0 / 255)
+def build_augmenter():
+    """Random flip/rotate/shift/zoom/brightness, applied per image inside tf.data."""
+    return keras.Sequential([
+        layers.RandomFlip("horizontal"),
+        layers.RandomRotation(15 / 360),
+        layers.RandomTranslation(0.15, 0.15),
+        layers.RandomZoom(0.1),
+        # Multiplicative, as ImageDataGenerator's brightness_range=[0.8, 1.2];
+        # RandomBrightness would add an offset instead
+        layers.Lambda(random_brightness_scale),
+    ])
 
+
+def resolve_data_dirs(data_dir):
+    """Return (train_dir, test_dir), falling back to public/dataset/."""
     train_dir = os.path.join(data_dir, "train")
     test_dir = os.path.join(data_dir, "test")
 
@@ -80,28 +91,77 @@ def create_data_generators(data_dir, batch_size=64, img_size=48):
                 "Please download and organize the FER-2013 dataset.\n"
                 "See the script docstring for expected directory structure."
             )
-
-    train_generator = train_datagen.flow_from_directory(
-        train_dir,
-        target_size=(img_size, img_size),
-        color_mode="grayscale",
-        batch_size=batch_size,
-        class_mode="categorical",
-        classes=EMOTION_LABELS,
-        shuffle=True,
+    return train_dir, test_dir
+
+
+def create_datasets(train_dir, test_dir, batch_size=64, img_size=48):
+    """
+    Create training and validation tf.data pipelines.
+
+    Images are decoded once and cached; shuffling, augmentation and batching
+    run in the tf.data graph with AUTOTUNE parallelism and prefetching, so
+    the accelerator isn't left waiting on Python-side preprocessing.
+
+    Returns:
+        (train_ds, val_ds, train_count, val_count)
+    """
+    def load(directory, shuffle):
+        # Unbatched here so the shuffle below mixes images, not whole batches
+        return keras.utils.image_dataset_from_directory(
+            directory,
+            labels="inferred",
+            label_mode="categorical",
+            class_names=EMOTION_LABELS,
+            color_mode="grayscale",
+            image_size=(img_size, img_size),
+            batch_size=None,
+            shuffle=shuffle,
+        )
+
+    def rescale(image, label):
+        return image / 255.0, label
+
+    autotune = tf.data.AUTOTUNE
+    augmenter = build_augmenter()
+
+    train_ds = load(train_dir, shuffle=True)
+    val_ds = load(test_dir, shuffle=False)
+    train_count = len(train_ds.file_paths)
+    val_count = len(val_ds.file_paths)
+
+    train_ds = (
+        train_ds.map(rescale, num_parallel_calls=autotune)
+        .cache()
+        .shuffle(SHUFFLE_BUFFER)
+        .batch(batch_size)
+        .map(lambda x, y: (augmenter(x, training=True), y), num_parallel_calls=autotune)
+        .prefetch(autotune)
     )
-
-    val_generator = val_datagen.flow_from_directory(
-        test_dir,
-        target_size=(img_size, img_size),
-        color_mode="grayscale",
-        batch_size=batch_size,
-        class_mode="categorical",
-        classes=EMOTION_LABELS,
-        shuffle=False,
+    val_ds = (
+        val_ds.map(rescale, num_parallel_calls=autotune)
+        .cache()
+        .batch(batch_size)
+        .prefetch(autotune)
     )
 
-    return train_generator, val_generator
+    return train_ds, val_ds, train_count, val_count
+
+
+def float32_copy(model):
+    """
+    Rebuild the model under the float32 policy with the same weights.
+
+    Mixed-precision training leaves float16 casts in the graph, which the
+    int8 converter would otherwise carry into the .tflite. The variables are
+    float32 either way, so the weights transfer directly.
+    """
+    if keras.mixed_precision.global_policy().name == "float32":
+        return model
+    keras.mixed_precision.set_global_policy("float32")
+    clone = build_emotion_model(num_classes=model.output_shape[-1],
+                                input_shape=model.input_shape[1:])
+    clone.set_weights(model.get_weights())
+    return clone
 
 
 def train(data_dir, epochs=50, batch_size=64):
@@ -116,14 +176,19 @@ def train(data_dir, epochs=50, batch_size=64):
     print(f"  Labels: {EMOTION_LABELS}")
     print("=" * 60)
 
-    # Create data generators
+    # Create data pipelines
     print("\nLoading data...")
-    train_gen, val_gen = create_data_generators(data_dir, batch_size)
-    print(f"  Training samples: {train_gen.samples}")
-    print(f"  Validation samples: {val_gen.samples}")
+    train_dir, test_dir = resolve_data_dirs(data_dir)
+    train_ds, val_ds, train_count, val_count = create_datasets(train_dir, test_dir, batch_size)
+    print(f"  Training samples: {train_count}")
+    print(f"  Validation samples: {val_count}")
 
     # Build model
     print("\nBuilding model...")
+    if enable_mixed_precision():
+        print("  Mixed precision: mixed_float16 (GPU)")
+        tf.config.optimizer.set_jit(True)
+        print("  XLA auto-clustering: on")
     model = build_emotion_model(num_classes=len(EMOTION_LABELS))
 
     # Callbacks
@@ -156,9 +221,9 @@ def train(data_dir, epochs=50, batch_size=64):
     # Train
     print("\nStarting training...\n")
     history = model.fit(
-        train_gen,
+        train_ds,
         epochs=epochs,
-        validation_data=val_gen,
+        validation_data=val_ds,
         callbacks=callbacks,
         verbose=1,
     )
@@ -167,12 +232,25 @@ def train(data_dir, epochs=50, batch_size=64):
     print("\n" + "=" * 60)
     print("  TRAINING COMPLETE")
     print("=" * 60)
-    val_loss, val_acc = model.evaluate(val_gen, verbose=0)
+    val_loss, val_acc = model.evaluate(val_ds, verbose=0)
     print(f"  Best validation accuracy: {val_acc:.4f}")
     print(f"  Best validation loss: {val_loss:.4f}")
     print(f"  Model saved to: {model_path}")
     print("=" * 60)
 
+    # Post-training int8 quantization, calibrated on training faces. The
+    # in-memory model holds the last epoch unless EarlyStopping fired, so
+    # quantize the checkpoint to match the best-epoch .h5
+    tflite_path = os.path.join(models_dir, "emotion_model_int8.tflite")
+    print("\nExporting int8 TFLite model...")
+    try:
+        best_model = keras.models.load_model(model_path, compile=False)
+        export_tflite_int8(float32_copy(best_model), tflite_path, train_dir)
+        file_size = os.path.getsize(tflite_path) / (1024 * 1024)
+        print(f"TFLite model saved to: {tflite_path} ({file_size:.2f} MB)")
+    except Exception as e:
+        print(f"[ERROR] int8 TFLite export failed: {e}")
+
     return history
 
 